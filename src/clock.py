@@ -0,0 +1,93 @@
+import datetime
+import heapq
+import itertools
+import time
+from math import ceil
+
+
+class Clock:
+    """
+    The wall clock. All reads of the current time and all timers of the app go through a clock, so that it can be
+    swapped for a SimulatedClock.
+    """
+    
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+    
+    def after(self, widget, ms: int, callback):
+        """
+        Call callback after ms milliseconds (used for periodic ticks).
+        """
+        return widget.after(ms, callback)
+    
+    def at(self, widget, when: datetime.datetime, callback):
+        """
+        Call callback at the given time (used for events, like an upgrade finishing).
+        """
+        ms = max(0, ceil((when - self.now()).total_seconds() * 1000))
+        return widget.after(ms, callback)
+    
+    def mark_event(self, widget, when: datetime.datetime):
+        """
+        Note that something happens at the given time without scheduling a callback (e.g. the end of a countdown that
+        is driven by ticks). Only a simulated clock cares, so it can jump there.
+        """
+
+
+class SimulatedClock(Clock):
+    """
+    A clock that runs `speed` times faster than real time, and can jump straight to the next event.
+    Timers are kept in a heap of simulated due times; Tk is only used to wake up when the next one might be due.
+    """
+    
+    def __init__(self, start: datetime.datetime | None = None, speed: float = 1000):
+        self.speed = speed
+        self._anchor_real = time.monotonic()
+        self._anchor_sim = start or datetime.datetime.now()
+        self._timers = []  # (due, seq, is_event, callback)
+        self._seq = itertools.count()
+    
+    def now(self) -> datetime.datetime:
+        elapsed = (time.monotonic() - self._anchor_real) * self.speed
+        return self._anchor_sim + datetime.timedelta(seconds=elapsed)
+    
+    def after(self, widget, ms: int, callback):
+        return self._schedule(widget, self.now() + datetime.timedelta(milliseconds=ms), callback, False)
+    
+    def at(self, widget, when: datetime.datetime, callback):
+        return self._schedule(widget, when, callback, True)
+    
+    def mark_event(self, widget, when: datetime.datetime):
+        self._schedule(widget, when, lambda: None, True)
+    
+    def _schedule(self, widget, due, callback, is_event):
+        heapq.heappush(self._timers, (due, next(self._seq), is_event, callback))
+        real_ms = ceil(max(0.0, (due - self.now()).total_seconds()) * 1000 / self.speed)
+        return widget.after(max(1, real_ms), self._run_due)
+    
+    def _run_due(self):
+        now = self.now()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, _, callback = heapq.heappop(self._timers)
+            callback()
+    
+    def advance(self, delta: datetime.timedelta):
+        """
+        Move the simulated time forward, and run all timers that are due by then.
+        """
+        self._anchor_sim += delta
+        self._run_due()
+    
+    def next_event(self) -> datetime.datetime | None:
+        return min((due for due, _, is_event, _ in self._timers if is_event), default=None)
+    
+    def jump_to_next_event(self) -> datetime.datetime | None:
+        """
+        Skip ahead to the next scheduled event (ticks in between are run once, not once per tick).
+        
+        :return: the time of the event, or None if nothing is scheduled
+        """
+        due = self.next_event()
+        if due is not None:
+            self.advance(max(datetime.timedelta(0), due - self.now()))
+        return due
@@ -11,6 +11,16 @@ COLUMN_DURATION = 'Duration'
 COLUMN_SVS = 'SvS Points'
 COLUMN_MINUTES = 'Duration (min)'
 
+# Prerequisite Columns
+COLUMN_REQUIRES = 'Requires'
+COLUMN_REQUIRED_LEVEL = 'Required Level'
+
+# Exchange Rate Columns
+COLUMN_FROM = 'From'
+COLUMN_TO = 'To'
+COLUMN_RATE = 'Rate'
+COLUMN_COST = 'Cost'
+
 # Buildings
 FURNACE = 'Furnace'
 EMBASSY = 'Embassy'
@@ -21,5 +31,3 @@ INFANTRY = 'Infantry'
 LANCERS = 'Lancers'
 MARKSMAN = 'Marksman'
 POSSIBLE_BUILDINGS = [FURNACE, EMBASSY, COMMAND, RESEARCH, INFIRMARY, INFANTRY, LANCERS, MARKSMAN]
-
-POSSIBLE_LEVELS = list(range(24, 31))
@@ -1,31 +1,104 @@
+import csv
+from functools import cache
+from importlib.resources import files
+from types import MappingProxyType
+
 from src.data.constants import *
 from src.data.constants import POSSIBLE_BUILDINGS
 
-FURNACE_DEPS = {
-    24: [EMBASSY, RESEARCH],
-    25: [EMBASSY, INFANTRY],
-    26: [EMBASSY, MARKSMAN],
-    27: [EMBASSY, LANCERS],
-    28: [EMBASSY, RESEARCH],
-    29: [EMBASSY, INFANTRY],
-    30: [EMBASSY, MARKSMAN],
-}
+PREREQUISITES_FILE = str(files('src').joinpath('data/prerequisites.csv'))
+
+# Types
+UPGRADE = tuple[str, int]
+
+
+@cache
+def prerequisites(path: str = PREREQUISITES_FILE) -> MappingProxyType:
+    """
+    Load the prerequisite graph, one row per edge: (Building, Level) requires (Requires, Required Level).
+    The same format holds the buildings and any other tree (e.g. Research Center research), since every node is just
+    a name and a level.
+    The graph is compiled once into a read-only mapping that is shared by every caller.
+    
+    :param path: path to the prerequisites csv
+    :return: a mapping of upgrade to the tuple of upgrades it depends on
+    """
+    graph: dict[UPGRADE, list[UPGRADE]] = {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            upgrade = (row[COLUMN_BUILDING], int(row[COLUMN_LEVEL]))
+            graph.setdefault(upgrade, []).append((row[COLUMN_REQUIRES], int(row[COLUMN_REQUIRED_LEVEL])))
+    return MappingProxyType({upgrade: tuple(deps) for upgrade, deps in graph.items()})
+
+
+@cache
+def required_by(path: str = PREREQUISITES_FILE) -> MappingProxyType:
+    """
+    :return: the prerequisite graph reversed, a mapping of upgrade to the tuple of upgrades that depend on it
+    """
+    graph: dict[UPGRADE, list[UPGRADE]] = {}
+    for upgrade, deps in prerequisites(path).items():
+        for dep in deps:
+            graph.setdefault(dep, []).append(upgrade)
+    return MappingProxyType({upgrade: tuple(dependents) for upgrade, dependents in graph.items()})
+
+
+@cache
+def _levels_by_name(path: str = PREREQUISITES_FILE) -> MappingProxyType:
+    """
+    Index the levels of every name in a single pass over the graph, including names that only appear as a
+    prerequisite (e.g. a root research node, which has no rows of its own).
+    
+    :return: a mapping of name to the sorted tuple of its levels, see levels
+    """
+    upgrade_levels: dict[str, set[int]] = {}
+    required_levels: dict[str, set[int]] = {}
+    for (name, level), deps in prerequisites(path).items():
+        upgrade_levels.setdefault(name, set()).add(level)
+        for dep_name, dep_level in deps:
+            required_levels.setdefault(dep_name, set()).add(dep_level)
+    index = {}
+    for name in dict.fromkeys([*upgrade_levels, *required_levels]):
+        known = upgrade_levels.get(name) or required_levels[name]
+        index[name] = tuple(sorted({min(known) - 1, *known, *required_levels.get(name, ())}))
+    return MappingProxyType(index)
+
+
+@cache
+def names(path: str = PREREQUISITES_FILE) -> tuple[str, ...]:
+    """
+    :return: the default buildings, followed by every other name (e.g. research) in the order of the prerequisite graph
+    """
+    return tuple(dict.fromkeys([*POSSIBLE_BUILDINGS, *_levels_by_name(path)]))
+
+
+@cache
+def known_names(path: str = PREREQUISITES_FILE) -> frozenset[str]:
+    """
+    :return: all building (and research) names that appear in the prerequisite graph, plus the default buildings
+    """
+    return frozenset(names(path))
+
+
+def levels(name: str, path: str = PREREQUISITES_FILE) -> tuple[int, ...]:
+    """
+    :return: the levels a building (or research) can be at: every level the graph has an upgrade for or requires, plus
+             the one below the lowest upgrade (where it starts)
+    """
+    return _levels_by_name(path).get(name, ())
 
 
-def depends_on(building: str, level: int):
+def depends_on(building: str, level: int) -> tuple[UPGRADE, ...]:
     """
-    All buildings require their previous level to be built.
-    Non-Furnace buildings also require the Furnace to be at the desired level.
-    The Furnace always depends on Embassy, as well as one other building that changes with each level.
+    Look up the prerequisites of an upgrade in the graph from prerequisites.csv.
+    Every edge is spelled out in the file, including the one to the previous level of the same building (or
+    research); an upgrade without any rows there has no prerequisites.
     
     :param building:
     :param level:
-    :return: a list of building-level tuples that the building at the given level depends on
+    :return: a tuple of building-level tuples that the building at the given level depends on
     """
-    if building != FURNACE:
-        return [('Furnace', level), (building, level - 1)]
-    else:
-        return [(dep, level - 1) for dep in FURNACE_DEPS[level]]
+    return prerequisites().get((building, level), ())
 
 
 def main():
@@ -37,7 +110,7 @@ def main():
     
     # noinspection PyPep8Naming
     G = nx.DiGraph()
-    nodes = [(building, level) for building in POSSIBLE_BUILDINGS for level in range(24, 31)]
+    nodes = [(building, level) for building in POSSIBLE_BUILDINGS for level in levels(building)]
     extra_nodes = []
     for node in nodes:
         b, l = node
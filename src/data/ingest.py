@@ -0,0 +1,202 @@
+import csv
+import hashlib
+import os
+import sys
+import tempfile
+from html.parser import HTMLParser
+from importlib.resources import files
+
+from src import time_conversions
+from src.data.constants import *
+from src.data.validate_data import NUMERIC_COLUMNS, REQUIRED_COLUMNS, validate_duration, validate_row
+
+DATA_FILE = str(files('src').joinpath('data/data.csv'))
+CHUNK_SIZE = 64 * 1024
+
+# Types
+ROW = dict[str, str]
+KEY = tuple[str, str]
+
+
+class ResultsTableParser(HTMLParser):
+    """
+    Streaming parser for the `<table class="results">` of a saved HTML export.
+    Finished rows are collected in `rows` as lists of cell texts, so the caller can drain them after every `feed`.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.rows: list[list[str]] = []
+        self._table_depth = 0
+        self._row = None
+        self._cell = None
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            if self._table_depth or 'results' in (dict(attrs).get('class') or '').split():
+                self._table_depth += 1
+        elif not self._table_depth:
+            return
+        elif tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+    
+    def handle_endtag(self, tag):
+        if not self._table_depth:
+            return
+        if tag == 'table':
+            self._table_depth -= 1
+        elif tag in ('td', 'th') and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+    
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def stream_rows(html_file: str):
+    """
+    Read the results table of an HTML export chunk by chunk, yielding rows in the format of data.csv.
+    The first row of the table is the header, every other row starts with a label cell that is dropped.
+    The TOTAL row is skipped.
+    
+    :param html_file: path to the saved HTML page
+    :return: a generator of dicts, one per upgrade
+    """
+    parser = ResultsTableParser()
+    header = None
+    with open(html_file, 'r', encoding='utf-8') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            parser.feed(chunk)
+            rows, parser.rows = parser.rows, []
+            for cells in rows:
+                if header is None:
+                    header = [cell for cell in cells if cell != '']
+                    continue
+                row = dict(zip(header, cells[1:]))
+                if row.get(COLUMN_BUILDING) == 'TOTAL':
+                    continue
+                yield normalize_row(row)
+        parser.close()
+
+
+def normalize_row(row: ROW) -> ROW:
+    """
+    Convert a raw table row the same way the notebook did: strip thousands separators from the numeric columns and
+    add the duration in minutes.
+    A malformed duration gets no minutes, so the row is rejected by validate_row instead of stopping the ingest.
+    """
+    row = {column: value.replace(',', '') if column in NUMERIC_COLUMNS else value
+           for column, value in row.items()}
+    if COLUMN_DURATION in row:
+        duration = row[COLUMN_DURATION]
+        row[COLUMN_MINUTES] = str(time_conversions.to_minutes(duration)) if validate_duration(duration) else ''
+    return row
+
+
+def row_key(row: ROW) -> KEY:
+    return row.get(COLUMN_BUILDING, ''), row.get(COLUMN_LEVEL, '')
+
+
+def row_hash(row: ROW) -> str:
+    return hashlib.blake2b('\x1f'.join(row.get(col, '') for col in REQUIRED_COLUMNS).encode(),
+                           digest_size=16).hexdigest()
+
+
+def load_table(data_file: str = DATA_FILE) -> tuple[list[str], dict[KEY, ROW]]:
+    """
+    :return: the column order and the rows of data.csv, keyed by (building, level) in file order
+    """
+    try:
+        with open(data_file, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = {row_key(row): row for row in reader}
+            return list(reader.fieldnames or REQUIRED_COLUMNS), rows
+    except FileNotFoundError:
+        return list(REQUIRED_COLUMNS), {}
+
+
+def write_table(columns: list[str], rows: dict[KEY, ROW], data_file: str = DATA_FILE):
+    """
+    Write the table to a temporary file next to data_file, then swap it in, so readers never see a partial file.
+    The temporary file gets the permissions of the file it replaces (mkstemp creates it as 0600). That is done by path
+    once it is closed, since os.fchmod is not available on Windows before Python 3.13.
+    """
+    directory = os.path.dirname(os.path.abspath(data_file))
+    try:
+        mode = os.stat(data_file).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.data.', suffix='.csv.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore', lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows.values())
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, data_file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def ingest(html_file: str, data_file: str = DATA_FILE) -> dict[str, list]:
+    """
+    Merge an HTML export into data.csv.
+    Rows are compared by hash against the current table, and only new or changed rows are validated.
+    Invalid rows are reported and left out; rows that are not in the export are kept as they are.
+    The table is only rewritten if something changed.
+    
+    :param html_file: path to the saved HTML page
+    :param data_file: path to the cost table
+    :return: the keys of the added, changed and unchanged rows, and (key, problems) for the rejected ones
+    """
+    columns, rows = load_table(data_file)
+    hashes = {key: row_hash(row) for key, row in rows.items()}
+    report = {'added': [], 'changed': [], 'unchanged': [], 'rejected': []}
+    
+    for row in stream_rows(html_file):
+        key = row_key(row)
+        if hashes.get(key) == row_hash(row):
+            report['unchanged'].append(key)
+            continue
+        problems = validate_row(row)
+        if problems:
+            report['rejected'].append((key, problems))
+            continue
+        report['changed' if key in rows else 'added'].append(key)
+        rows[key] = row
+    
+    if report['added'] or report['changed']:
+        write_table(columns, rows, data_file)
+    return report
+
+
+def main():
+    """
+    Usage: python -m src.data.ingest [export.html]
+    Without an argument, the first .html file in the data folder is used, like the notebook did.
+    """
+    if len(sys.argv) > 1:
+        html_file = sys.argv[1]
+    else:
+        html_file = str([f for f in files('src').joinpath('data').iterdir() if f.name.endswith('.html')][0])
+    
+    report = ingest(html_file)
+    print(f"Added {len(report['added'])}, changed {len(report['changed'])}, "
+          f"unchanged {len(report['unchanged'])}, rejected {len(report['rejected'])} rows.")
+    for (building, level), problems in report['rejected']:
+        print(f"{building} {level}: {'; '.join(problems)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,13 @@ import re
 
 from src import time_conversions
 from src.data.constants import *
-from src.data.constants import POSSIBLE_BUILDINGS
+from src.data.dependencies import known_names
 
 REQUIRED_COLUMNS = [
     COLUMN_BUILDING, COLUMN_LEVEL, COLUMN_MEAT, COLUMN_WOOD, COLUMN_COAL, COLUMN_IRON, COLUMN_CRYSTAL, COLUMN_RFC,
     COLUMN_DURATION, COLUMN_SVS, COLUMN_MINUTES
 ]
+NUMERIC_COLUMNS = [col for col in REQUIRED_COLUMNS if col not in (COLUMN_BUILDING, COLUMN_DURATION)]
 DURATION_PATTERN = re.compile(r'^(\d+d )?(\d+h )?(\d+m)?$')
 
 
@@ -19,6 +20,38 @@ def validate_duration(duration):
     return bool(DURATION_PATTERN.match(duration))
 
 
+def validate_row(row: dict) -> list[str]:
+    """
+    Run the same checks as main() on a single row, so callers that only touch a few rows don't need to reload the
+    whole table.
+    
+    :param row: a mapping of column name to value, as read from data.csv
+    :return: a list of problems found, empty if the row is valid
+    """
+    problems = []
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in row]
+    if missing_columns:
+        return [f"Missing columns: {', '.join(missing_columns)}"]
+    
+    duration = str(row[COLUMN_DURATION])
+    if not validate_duration(duration):
+        problems.append(f"Invalid duration format: {duration}")
+    elif str(row[COLUMN_MINUTES]) != str(time_conversions.to_minutes(duration)):
+        problems.append(f"Duration in minutes is incorrect: {row[COLUMN_MINUTES]}")
+    
+    if row[COLUMN_BUILDING] not in known_names():
+        problems.append(f"Invalid building name: {row[COLUMN_BUILDING]}")
+    
+    # the same columns the notebook converted with pd.to_numeric
+    for col in NUMERIC_COLUMNS:
+        try:
+            float(row[col])
+        except (TypeError, ValueError):
+            problems.append(f"Not a number in {col}: {row[col]}")
+    
+    return problems
+
+
 def main():
     # Load the data
     data = pd.read_csv(str(files('src').joinpath('data/data.csv')))
@@ -46,7 +79,7 @@ def main():
         print("Duration in minutes is correct.")
         
     # Check that the building names are correct
-    invalid_buildings = data[~data[COLUMN_BUILDING].isin(POSSIBLE_BUILDINGS)]
+    invalid_buildings = data[~data[COLUMN_BUILDING].isin(list(known_names()))]
     if not invalid_buildings.empty:
         print("Rows with invalid building names:")
         print(invalid_buildings)
@@ -0,0 +1,311 @@
+import csv
+from functools import cache
+from importlib.resources import files
+from math import log
+from types import MappingProxyType
+
+from src.data.constants import *
+
+EXCHANGE_RATES_FILE = str(files('src').joinpath('data/exchange_rates.csv'))
+RESOURCES = ['Meat', 'Wood', 'Coal', 'Iron', 'Crystal', 'RFC']
+BIG_M = 1e6  # cost of leaving a unit uncovered, relative to the most expensive exchange
+EPSILON = 1e-9
+
+# Types
+EXCHANGE = tuple[str, str, float, float]  # source, target, rate, cost
+
+
+@cache
+def exchange_rates(path: str = EXCHANGE_RATES_FILE) -> tuple[EXCHANGE, ...]:
+    """
+    Load the exchange rates, one row per conversion: spending 1 `From` gives `Rate` of `To`, at `Cost` per `From`.
+    A `From` that is not one of the RESOURCES (like a resource chest or a pack) is an unlimited purchase.
+    
+    :param path: path to the exchange rates csv
+    :return: a tuple of (source, target, rate, cost), shared by every caller
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return tuple((row[COLUMN_FROM], row[COLUMN_TO], float(row[COLUMN_RATE]), float(row[COLUMN_COST]))
+                     for row in csv.DictReader(f))
+
+
+def solve(need: dict[str, float], stock: dict[str, float], rates: tuple[EXCHANGE, ...] | None = None,
+          bases: dict | None = None) -> dict:
+    """
+    Find the cheapest way to cover what is missing from stock, as a small linear program:
+    minimize the cost of all exchanges, such that for every resource
+    stock + what is exchanged into it - what is exchanged out of it >= need.
+    Whatever can't be covered at all is reported as uncovered instead of making the problem infeasible.
+    
+    :param need: amount needed per resource
+    :param stock: amount available per resource (including expected income)
+    :param rates: the exchanges to choose from, by default the ones from exchange_rates.csv
+    :param bases: optimal bases of earlier solves with the same rates, keyed by which resources were short, and
+                  updated in place. Only the amounts differ between such problems, so as long as a basis gives no
+                  negative amounts it is still optimal, and the simplex is skipped.
+    :return: {'cost': total cost, 'exchanges': {(source, target): amount of source spent},
+              'uncovered': {resource: amount}}
+    """
+    rates = exchange_rates() if rates is None else rates
+    _check_rates(rates)
+    resources = _balances(rates, need.keys() | stock.keys())
+    return _solve([stock.get(r, 0) - need.get(r, 0) for r in resources], resources, rates, bases)
+
+
+def _balances(rates: tuple[EXCHANGE, ...], names) -> tuple[str, ...]:
+    """
+    :return: the resources to keep a balance of, in a fixed order: the RESOURCES, everything an exchange produces and
+             the given names. Sources that are none of these are purchases, and have no balance to keep.
+    """
+    return tuple(sorted(set(RESOURCES).union(names, (target for _, target, _, _ in rates))))
+
+
+@cache
+def _check_rates(rates: tuple[EXCHANGE, ...]):
+    """
+    Every From/To pair has one rate, since exchanges are tracked per pair.
+    Exchanges between resources must not go around in a circle that gives back more than it took (like 1 Meat ->
+    2 Wood -> 2 Meat), or any amount could be covered for free. Such a circle is found the way Bellman-Ford finds a
+    negative cycle, with -log(rate) as the length of an exchange.
+    """
+    pairs = set()
+    for source, target, _, _ in rates:
+        if (source, target) in pairs:
+            raise ValueError(f'Exchange from {source} to {target} is listed twice, check exchange_rates.csv')
+        pairs.add((source, target))
+    
+    balances = _balances(rates, ())
+    edges = [(source, target, -log(rate)) for source, target, rate, _ in rates if source in balances and rate > 0]
+    distance = dict.fromkeys(balances, 0.0)
+    for _ in range(len(balances)):
+        relaxed = False
+        for source, target, length in edges:
+            if distance[source] + length < distance[target] - EPSILON:
+                distance[target] = distance[source] + length
+                relaxed = True
+        if not relaxed:
+            return
+    raise ValueError('Exchange rates allow unlimited profit, check exchange_rates.csv')
+
+
+def _solve(have: list[float], resources: tuple[str, ...], rates: tuple[EXCHANGE, ...], bases: dict | None) -> dict:
+    """
+    solve, given the balance (stock - need) of every resource, in the order of resources.
+    """
+    # what no exchange produces stays uncovered, and doesn't need the linear program
+    produced = {target for _, target, _, _ in rates}
+    unproduced = {r: -amount for r, amount in zip(resources, have) if amount < 0 and r not in produced}
+    if unproduced:
+        have = [0 if r in unproduced else amount for r, amount in zip(resources, have)]
+    short = tuple(amount < 0 for amount in have)
+    if not any(short):
+        return {'cost': 0, 'exchanges': {}, 'uncovered': unproduced}
+    
+    amount_scale = max(map(abs, have))
+    key = (resources, short)
+    if bases is not None and key in bases:
+        basis, inverse = bases[key]
+        amounts = [sum(value * amount for value, amount in zip(row, have)) for row in inverse]
+        if all(amount >= -EPSILON * amount_scale for amount in amounts):
+            return _solution(rates, resources, basis, amounts, unproduced)
+    
+    # scale to keep the tableau well-conditioned (amounts go into the billions)
+    cost_scale = max([cost for *_, cost in rates if cost > 0], default=1)
+    
+    # columns: one per exchange, one "uncovered" per resource, one slack per resource
+    n_rates, n_rows = len(rates), len(resources)
+    n_cols = n_rates + 2 * n_rows
+    costs = [cost / cost_scale for *_, cost in rates] + [BIG_M] * n_rows + [0] * n_rows
+    
+    # row per resource: spent - received - uncovered + slack = have
+    rows = []
+    basis = []
+    for i, resource in enumerate(resources):
+        row = [0.0] * (n_cols + 1)
+        for j, (source, target, rate, _) in enumerate(rates):
+            if source == resource:
+                row[j] += 1
+            if target == resource:
+                row[j] -= rate
+        row[n_rates + i] = -1
+        row[n_rates + n_rows + i] = 1
+        row[-1] = have[i] / amount_scale
+        if row[-1] < 0:
+            # start with the resource uncovered, which is always feasible
+            row = [-value for value in row]
+            basis.append(n_rates + i)
+        else:
+            basis.append(n_rates + n_rows + i)
+        rows.append(row)
+    
+    _simplex(rows, basis, costs)
+    
+    # the slack columns started out as the identity, so now they hold the inverse of the basis
+    if bases is not None:
+        bases[key] = basis, [row[n_rates + n_rows:n_cols] for row in rows]
+    return _solution(rates, resources, basis, [row[-1] * amount_scale for row in rows], unproduced)
+
+
+def _solution(rates: tuple[EXCHANGE, ...], resources: tuple[str, ...], basis: list[int], amounts: list[float],
+              unproduced: dict[str, float]) -> dict:
+    """
+    Read the exchanges and uncovered resources off the amounts of the basic columns (see solve).
+    """
+    exchanges = {}
+    uncovered = dict(unproduced)
+    cost = 0
+    for col, amount in zip(basis, amounts):
+        if amount <= EPSILON:
+            continue
+        if col < len(rates):
+            source, target, _, rate_cost = rates[col]
+            exchanges[source, target] = exchanges.get((source, target), 0) + amount
+            cost += amount * rate_cost
+        elif col < len(rates) + len(resources):
+            uncovered[resources[col - len(rates)]] = amount
+    return {'cost': cost, 'exchanges': exchanges, 'uncovered': uncovered}
+
+
+def _simplex(rows: list[list[float]], basis: list[int], costs: list[float]):
+    """
+    Minimize costs over the tableau in place, starting from a feasible basis.
+    Bland's rule (lowest index enters and leaves) keeps it from cycling; the problems here are tiny, so that is fast
+    enough.
+    """
+    while True:
+        # reduced costs of the non-basic columns
+        entering = None
+        for j in range(len(costs)):
+            if j in basis:
+                continue
+            reduced = costs[j] - sum(costs[b] * row[j] for row, b in zip(rows, basis))
+            if reduced < -EPSILON:
+                entering = j
+                break
+        if entering is None:
+            return
+        
+        leaving = None
+        for i, row in enumerate(rows):
+            if row[entering] > EPSILON:
+                ratio = row[-1] / row[entering]
+                if leaving is None or ratio < best - EPSILON or (
+                        ratio <= best + EPSILON and basis[i] < basis[leaving]):
+                    leaving, best = i, ratio
+        if leaving is None:
+            raise ValueError('Exchange rates allow unlimited profit, check exchange_rates.csv')
+        
+        pivot = rows[leaving]
+        pivot_value = pivot[entering]
+        rows[leaving] = pivot = [value / pivot_value for value in pivot]
+        for i, row in enumerate(rows):
+            factor = row[entering]
+            if i != leaving and factor:
+                rows[i] = [value - factor * p for value, p in zip(row, pivot)]
+        basis[leaving] = entering
+
+
+@cache
+def unit_costs(rates: tuple[EXCHANGE, ...] | None = None) -> MappingProxyType:
+    """
+    The cost of one unit of every resource if it has to be exchanged for, following chains of exchanges where that is
+    cheaper. With nothing in stock every resource is covered on its own, so this is what solve would pay per unit.
+    Resources that no exchange produces are left out.
+    
+    :param rates: the exchanges to choose from, by default the ones from exchange_rates.csv
+    :return: a mapping of resource to cost per unit, shared by every caller
+    """
+    rates = exchange_rates() if rates is None else rates
+    _check_rates(rates)
+    balances = _balances(rates, ())
+    costs: dict[str, float] = {}
+    # cheapest paths: relax every exchange until nothing improves, which takes at most one round per exchange
+    for _ in range(len(rates) + 1):
+        improved = False
+        for source, target, rate, cost in rates:
+            if rate <= 0 or (source in balances and source not in costs):
+                continue
+            offer = (costs.get(source, 0) + cost) / rate
+            if target not in costs or offer < costs[target] * (1 - EPSILON):
+                costs[target] = offer
+                improved = True
+        if not improved:
+            return MappingProxyType(costs)
+    raise ValueError('Exchange rates allow unlimited profit, check exchange_rates.csv')
+
+
+def plan_cover(needs: list[dict[str, float]], start_minutes: list[float], stock: dict[str, float],
+               income_per_hour: dict[str, float], rates: tuple[EXCHANGE, ...] | None = None,
+               previous: list[dict] | None = None) -> list[dict]:
+    """
+    Cover the resource gap along the plan, one upgrade at a time. Exchanges made for an upgrade stay made: each upgrade
+    only adds the cheapest exchanges for what is still missing, given the stock, the income collected until it starts
+    and everything exchanged before. So the cost of an upgrade is never negative, and the cumulative cost only grows.
+    
+    :param needs: resources needed per upgrade, in plan order
+    :param start_minutes: minutes from now until each upgrade starts
+    :param stock: resources available now
+    :param income_per_hour: expected income per resource
+    :param rates: the exchanges to choose from, by default the ones from exchange_rates.csv
+    :param previous: the result of an earlier call; the upgrades at the start of the plan whose inputs didn't change
+                     are taken from it instead of being solved again
+    :return: per upgrade, the cumulative 'cost' and 'exchanges' up to and including it, what is still 'uncovered' at
+             that point, and 'upgrade_cost', the part of the cost added by it (plus the 'balance' and 'inputs' that a
+             later call needs to continue from it)
+    """
+    rates = exchange_rates() if rates is None else rates
+    _check_rates(rates)
+    resources = _balances(rates, stock.keys() | income_per_hour.keys() | {r for need in needs for r in need})
+    index = {r: i for i, r in enumerate(resources)}
+    rate_of = {(source, target): rate for source, target, rate, _ in rates}
+    available_now = [stock.get(r, 0) for r in resources]
+    income_per_minute = [income_per_hour.get(r, 0) / 60 for r in resources]
+    if previous and previous[0]['inputs'][2:] != (stock, income_per_hour, rates, resources):
+        previous = None
+    
+    covers = []
+    cumulative_need = [0] * len(resources)
+    exchanged = [0] * len(resources)  # what the exchanges so far added to (or took from) every resource
+    exchanges: dict[tuple[str, str], float] = {}
+    cost = 0
+    bases = {}
+    for need, minutes in zip(needs, start_minutes):
+        cover = previous[len(covers)] if previous is not None and len(covers) < len(previous) else None
+        if cover is not None and cover['inputs'][:2] == (need, minutes):
+            cumulative_need, exchanged = cover['balance']
+            exchanges, cost = cover['exchanges'], cover['cost']
+            covers.append(cover)
+            continue
+        previous = None
+        
+        cumulative_need = cumulative_need.copy()
+        for resource, amount in need.items():
+            cumulative_need[index[resource]] += amount
+        have = [now + income * minutes + change - needed
+                for now, income, change, needed in zip(available_now, income_per_minute, exchanged, cumulative_need)]
+        
+        # the upgrades only differ in amounts, so a few bases cover the whole plan
+        step = _solve(have, resources, rates, bases)
+        if step['exchanges']:
+            exchanges = exchanges.copy()
+            exchanged = exchanged.copy()
+            for (source, target), amount in step['exchanges'].items():
+                exchanges[source, target] = exchanges.get((source, target), 0) + amount
+                if source in index:
+                    exchanged[index[source]] -= amount
+                exchanged[index[target]] += amount * rate_of[source, target]
+        cost += step['cost']
+        covers.append({'cost': cost, 'exchanges': exchanges, 'uncovered': step['uncovered'],
+                       'upgrade_cost': step['cost'], 'balance': (cumulative_need, exchanged),
+                       'inputs': (need, minutes, stock, income_per_hour, rates, resources)})
+    return covers
+
+
+def describe(cover: dict) -> str:
+    """
+    :return: a short summary of a solution, e.g. "Iron: 2,000,000 Resource Chest; uncovered Crystal: 500"
+    """
+    exchanges = sorted(cover['exchanges'].items(), key=lambda item: item[0][1])
+    parts = [f'{target}: {amount:,.0f} {source}' for (source, target), amount in exchanges]
+    parts += [f'uncovered {resource}: {amount:,.0f}' for resource, amount in cover['uncovered'].items()]
+    return '; '.join(parts)
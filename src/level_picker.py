@@ -0,0 +1,101 @@
+import tkinter as tk
+from tkinter import ttk
+
+from src.data.constants import *
+from src.data.dependencies import levels, names
+
+CURRENT = 'current'
+DESIRED = 'desired'
+FILTER_LIMIT = 200  # most names shown in the research dropdown at once
+
+
+class LevelPicker:
+    """
+    The current and desired level of every building (or research), as the text of their comboboxes.
+    The default buildings get a row each. All other names (a research tree can have thousands) share one row: a name
+    box that filters on what is typed, and a current and desired combobox for the chosen name. So the number of
+    widgets and traced variables stays the same however large prerequisites.csv gets.
+    """
+    
+    def __init__(self, root: tk.Misc, on_change):
+        self.root = root
+        self.on_change = on_change
+        self.levels = {CURRENT: dict.fromkeys(names(), ''), DESIRED: dict.fromkeys(names(), '')}
+        self.vars: dict[str, dict[str, tk.StringVar]] = {CURRENT: {}, DESIRED: {}}  # name -> var of a visible combobox
+        self.research = [name for name in names() if name not in POSSIBLE_BUILDINGS]
+        self.selected = None  # the research shown in the shared row
+        
+        # WIDGETS (one row each: label, current level, desired level)
+        self.rows = []
+        for building in POSSIBLE_BUILDINGS:
+            self.rows.append((tk.Label(root, text=building),
+                              self._combobox(building, CURRENT, levels(building)),
+                              self._combobox(building, DESIRED, levels(building))))
+        if self.research:
+            self.name_var = tk.StringVar(root)
+            self.name_var.trace_add('write', self._select)
+            self.name_box = ttk.Combobox(root, textvariable=self.name_var, postcommand=self._filter, width=20)
+            self.research_vars = {CURRENT: self._var(None, CURRENT), DESIRED: self._var(None, DESIRED)}
+            self.research_boxes = {which: ttk.Combobox(root, textvariable=var, width=5, state=tk.DISABLED)
+                                   for which, var in self.research_vars.items()}
+            self.rows.append((self.name_box, self.research_boxes[CURRENT], self.research_boxes[DESIRED]))
+    
+    def _var(self, name, which):
+        var = tk.StringVar(self.root)
+        var.trace_add('write', lambda *_: self._write(name, which, var.get()))
+        return var
+    
+    def _combobox(self, name, which, values):
+        var = self.vars[which][name] = self._var(name, which)
+        return ttk.Combobox(self.root, textvariable=var, values=values, width=5)
+    
+    def _write(self, name, which, text):
+        """
+        A combobox was edited: keep its text, and let the owner replan.
+        """
+        name = name or self.selected
+        if name is None:
+            return
+        self.levels[which][name] = text
+        self.on_change()
+    
+    def _filter(self):
+        typed = self.name_var.get().casefold()
+        self.name_box.config(values=[name for name in self.research if typed in name.casefold()][:FILTER_LIMIT])
+    
+    def _select(self, *_):
+        """
+        Show the levels of the research whose name is typed or picked in the name box.
+        """
+        name = self.name_var.get()
+        if name not in self.levels[CURRENT] or name in POSSIBLE_BUILDINGS:
+            return
+        self.selected = name
+        for which, var in self.research_vars.items():
+            self.research_boxes[which].config(values=levels(name), state=tk.NORMAL)
+            var.set(self.levels[which][name])
+    
+    def get(self, which: str) -> dict[str, str]:
+        """
+        :param which: CURRENT or DESIRED
+        :return: the level text of every name
+        """
+        return self.levels[which]
+    
+    def set(self, which: str, name: str, level):
+        """
+        Set the level of one name, and its combobox if it is on screen.
+        """
+        self.levels[which][name] = str(level)
+        var = self.research_vars[which] if self.research and name == self.selected else self.vars[which].get(name)
+        if var is not None:
+            var.set(str(level))
+        self.on_change()
+    
+    def set_all(self, which: str, level: int):
+        """
+        Set every name that can be at the given level (the master comboboxes).
+        """
+        for name in self.levels[which]:
+            if level in levels(name):
+                self.set(which, name, level)
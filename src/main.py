@@ -1,14 +1,22 @@
+import argparse
+import datetime
 import json
+import re
 import tkinter as tk
+from functools import cache
 from tkinter import ttk
 from importlib.resources import files
+from types import MappingProxyType
 
 import pandas as pd
 
+from src.clock import Clock, SimulatedClock
 from src.data import validate_data
 from src.data.constants import *
-from src.data.dependencies import depends_on
+from src.data.dependencies import levels
+from src.planner import Planner
 from src.unit_conversions import to_units
+from level_picker import CURRENT, DESIRED, LevelPicker
 from upgrade_table import UpgradeTable
 
 # Types
@@ -22,51 +30,79 @@ ZINMAN_SKILL = 'Zinman Skill%'
 CONSTRUCTION_SPEED = 'Construction Speed%'
 
 SAVEFILE = 'data.json'
+ARCHIVE = 'archive.csv'
+DEFAULT_PROFILE = 'main'
+PROFILE_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
 
 
 def load_data():
     return pd.read_csv(str(files('src').joinpath('data/data.csv')))
 
 
+@cache
+def load_cost_index() -> MappingProxyType:
+    """
+    The cost rows keyed by (building, level), built once and shared read-only by every table.
+    """
+    return MappingProxyType({(row[COLUMN_BUILDING], row[COLUMN_LEVEL]): MappingProxyType(row)
+                             for row in load_data().to_dict('records')})
+
+
+def profile_name(profile: str) -> str:
+    """
+    Profile names end up in file names, so only letters, digits, - and _ are allowed.
+    """
+    if not PROFILE_PATTERN.fullmatch(profile):
+        raise ValueError(f'Invalid profile name {profile!r}, use only letters, digits, - and _')
+    return profile
+
+
+def save_paths(profile: str) -> tuple[str, str]:
+    """
+    The default profile keeps the original file names, so existing saves keep working.
+    
+    :return: the save file and archive file of the profile
+    """
+    profile = profile_name(profile)
+    if profile == DEFAULT_PROFILE:
+        return SAVEFILE, ARCHIVE
+    return f'data-{profile}.json', f'archive-{profile}.csv'
+
+
 class WosJumpClock:
-    def __init__(self, root):
+    def __init__(self, root, clock: Clock | None = None, profile: str = DEFAULT_PROFILE):
         # STATE
-        self.root: tk.Tk = root
-        validate_data.main()
-        self.cost_data: pd.DataFrame = load_data()
+        self.root: tk.Misc = root
+        self.clock: Clock = clock or Clock()
+        self.profile = profile
+        self.savefile, self.archive_file = save_paths(profile)
+        self.simulated = isinstance(self.clock, SimulatedClock)  # replays may load the real save, but never write it
+        self.visible = True
+        self.cost_index: MappingProxyType = load_cost_index()
         self.archive: pd.DataFrame | None = None
         
         # calculation state
         self.done: set[UPGRADE] = set()
         self.ordered_todo: list[UPGRADE] = []
         self.status: dict[UPGRADE, str] = {}
-        
-        # GUI
-        self.root.title("WOS Jump Clock")
-        self.root.state("zoomed")
+        self.planner = Planner()
+        self._replan_pending = None
         
         # WIDGETS
-        self.current_level_var = tk.IntVar()
-        self.desired_level_var = tk.IntVar()
+        building_levels = sorted({level for building in POSSIBLE_BUILDINGS for level in levels(building)})
+        self.current_level_var = tk.IntVar(self.root)
+        self.desired_level_var = tk.IntVar(self.root)
         self.current_level_combobox = ttk.Combobox(self.root, textvariable=self.current_level_var,
-                                                   values=POSSIBLE_LEVELS, width=5)
+                                                   values=building_levels, width=5)
         self.desired_level_combobox = ttk.Combobox(self.root, textvariable=self.desired_level_var,
-                                                   values=POSSIBLE_LEVELS, width=5)
+                                                   values=building_levels, width=5)
         self.current_level_var.trace_add('write', self._update_all_current_levels)
         self.desired_level_var.trace_add('write', self._update_all_desired_levels)
-        self.building_labels = {}
-        self.current_level_comboboxes = {}
-        self.desired_level_comboboxes = {}
-        for building in POSSIBLE_BUILDINGS:
-            building_label = tk.Label(self.root, text=building)
-            current_level_combobox = ttk.Combobox(self.root, values=POSSIBLE_LEVELS, width=5)
-            desired_level_combobox = ttk.Combobox(self.root, values=POSSIBLE_LEVELS, width=5)
-            
-            self.building_labels[building] = building_label
-            self.current_level_comboboxes[building] = current_level_combobox
-            self.desired_level_comboboxes[building] = desired_level_combobox
+        self.level_picker = LevelPicker(self.root, self._schedule_replan)
         
         self.save_button = tk.Button(self.root, text='Save all', command=self._save)
+        if self.simulated:
+            self.save_button.config(state=tk.DISABLED)
         self.load_button = tk.Button(self.root, text='Load', command=self._load)
         self.validate_button = tk.Button(self.root, text='Validate', command=self._clean)
         self.calculate_button = tk.Button(self.root, text='Calculate', command=self._calculate)
@@ -92,31 +128,37 @@ class WosJumpClock:
         self.desired_level_combobox.grid(row=nrows, column=2)
         
         nrows += 1
-        for i, (building, building_label) in enumerate(self.building_labels.items()):
-            building_label.grid(row=i + nrows, column=0, sticky='e')
-            self.current_level_comboboxes[building].grid(row=i + nrows, column=1)
-            self.desired_level_comboboxes[building].grid(row=i + nrows, column=2)
+        for i, (label, current_level_combobox, desired_level_combobox) in enumerate(self.level_picker.rows):
+            label.grid(row=i + nrows, column=0, sticky='e')
+            current_level_combobox.grid(row=i + nrows, column=1)
+            desired_level_combobox.grid(row=i + nrows, column=2)
         
         self.resources = {
-            'Meat': tk.Entry(self.root),
-            'Wood': tk.Entry(self.root),
-            'Coal': tk.Entry(self.root),
-            'Iron': tk.Entry(self.root),
-            'Crystal': tk.Entry(self.root),
-            'RFC': tk.Entry(self.root),
-            'Construction Speedups (min)': tk.Entry(self.root),
-            'General Speedups (min)': tk.Entry(self.root),
+            'Meat': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Wood': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Coal': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Iron': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Crystal': tk.Entry(self.root, textvariable=self._traced_var()),
+            'RFC': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Construction Speedups (min)': tk.Entry(self.root, textvariable=self._traced_var()),
+            'General Speedups (min)': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Meat Income/h': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Wood Income/h': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Coal Income/h': tk.Entry(self.root, textvariable=self._traced_var()),
+            'Iron Income/h': tk.Entry(self.root, textvariable=self._traced_var()),
         }
         for i, (resource, entry) in enumerate(self.resources.items()):
             tk.Label(self.root, text=resource).grid(row=i + nrows, column=3, sticky='e')
             entry.grid(row=i + nrows, column=4)
         
         self.bonuses = {
-            CONSTRUCTION_SPEED: tk.Entry(self.root, width=5),
-            ZINMAN_SKILL: ttk.Combobox(self.root, values=[str(x) for x in range(0, 18, 3)], width=5),
-            DOUBLE_TIME: ttk.Combobox(self.root, values=['0', '20'], width=5),
-            HYENA_SKILL: ttk.Combobox(self.root, values=['0', '5', '7', '9', '12', '15'], width=5),
-            CASTLE_BUFFS: ttk.Combobox(self.root, values=['0'], width=5),
+            CONSTRUCTION_SPEED: tk.Entry(self.root, textvariable=self._traced_var(), width=5),
+            ZINMAN_SKILL: ttk.Combobox(self.root, textvariable=self._traced_var(),
+                                       values=[str(x) for x in range(0, 18, 3)], width=5),
+            DOUBLE_TIME: ttk.Combobox(self.root, textvariable=self._traced_var(), values=['0', '20'], width=5),
+            HYENA_SKILL: ttk.Combobox(self.root, textvariable=self._traced_var(),
+                                      values=['0', '5', '7', '9', '12', '15'], width=5),
+            CASTLE_BUFFS: ttk.Combobox(self.root, textvariable=self._traced_var(), values=['0'], width=5),
         }
         for i, (bonus, entry) in enumerate(self.bonuses.items()):
             tk.Label(self.root, text=bonus).grid(row=i + nrows, column=5, sticky='e')
@@ -128,7 +170,7 @@ class WosJumpClock:
         self.validate_button.grid(row=i + nrows + 1, column=5, sticky='e')
         self.calculate_button.grid(row=i + nrows + 1, column=6, sticky='ew')
         
-        nrows += max(len(self.building_labels), len(self.resources))
+        nrows += max(len(self.level_picker.rows), len(self.resources))
         
         # one separator row
         ttk.Separator(self.root, orient='horizontal').grid(row=nrows, column=0, columnspan=7, sticky='ew')
@@ -144,9 +186,6 @@ class WosJumpClock:
         # Table layout
         self.table_frame.grid(row=nrows, column=0, columnspan=7, sticky='ew')
         
-        # BINDINGS
-        self.root.bind("<Escape>", self._exit)
-        
         # ACTIONS
         self._load()
     
@@ -157,11 +196,15 @@ class WosJumpClock:
         self.log_text.config(state=tk.DISABLED)
     
     def _save(self):
+        if self.simulated:
+            self._log('Saving is off in simulation mode')
+            return
+        
         # get all values into a dictionary
         data = {}
-        for building in POSSIBLE_BUILDINGS:
-            data[building] = {'current_level': self.current_level_comboboxes[building].get(),
-                              'desired_level': self.desired_level_comboboxes[building].get()}
+        current, desired = self.level_picker.get(CURRENT), self.level_picker.get(DESIRED)
+        for building in current:
+            data[building] = {'current_level': current[building], 'desired_level': desired[building]}
         
         for resource, entry in self.resources.items():
             data[resource] = entry.get()
@@ -173,39 +216,39 @@ class WosJumpClock:
         data['status'] = [[building, level, status] for (building, level), status in self.status.items()]
         
         # save to json file
-        with open(SAVEFILE, 'w') as f:
+        with open(self.savefile, 'w') as f:
             json.dump(data, f, indent=4)
         
         # also archive the data (timestamped) for later stats
         if self.archive is None:
             self.archive = pd.DataFrame(columns=['timestamp', 'key', 'value'])
-        now = pd.Timestamp.now()
+        now = pd.Timestamp(self.clock.now())
         for key, value in data.items():
             row = {'timestamp': now, 'key': key, 'value': value if isinstance(value, str)
             else value['current_level'] if isinstance(value, dict) else f'ERROR {value}'}
             self.archive = pd.concat([self.archive, pd.DataFrame(row, index=[0])], ignore_index=True)
         
-        self.archive.to_csv('archive.csv', index=False)
+        self.archive.to_csv(self.archive_file, index=False)
         
-        self._log(f'Saved {len(data)} values to save file')
+        self._log(f'Saved {len(data)} values to {self.savefile}')
     
     def _load(self):
         # load from json file
         try:
-            with open(SAVEFILE, 'r') as f:
+            with open(self.savefile, 'r') as f:
                 data = json.load(f)
         except FileNotFoundError:
             self._log('No save file found')
             return
         
         # set all values
-        for building in POSSIBLE_BUILDINGS:
-            self.current_level_comboboxes[building].set(data[building]['current_level'])
-            self.desired_level_comboboxes[building].set(data[building]['desired_level'])
+        for building in self.level_picker.get(CURRENT).keys() & data.keys():
+            self.level_picker.set(CURRENT, building, data[building]['current_level'])
+            self.level_picker.set(DESIRED, building, data[building]['desired_level'])
         
         for resource, entry in self.resources.items():
             entry.delete(0, tk.END)
-            entry.insert(0, data[resource])
+            entry.insert(0, data.get(resource, '0'))
         
         for bonus, entry in self.bonuses.items():
             if bonus == CONSTRUCTION_SPEED:
@@ -214,18 +257,20 @@ class WosJumpClock:
             else:
                 entry.set(data[bonus])
         
-        self.ordered_todo = data.get('todo', [])
+        self.ordered_todo = [(building, level) for building, level in data.get('todo', [])]
+        self.planner = Planner(self.ordered_todo)
         self.status = {(building, level): status
                        for building, level, status in data.get('status', [])}
         
         # load the csv archive, or create it if it doesn't exist
         try:
-            self.archive = pd.read_csv('archive.csv')
+            self.archive = pd.read_csv(self.archive_file)
         except FileNotFoundError:
             self.archive = pd.DataFrame(columns=['timestamp', 'key', 'value'])
-            self.archive.to_csv('archive.csv', index=False)
+            if not self.simulated:
+                self.archive.to_csv(self.archive_file, index=False)
         
-        self._log(f'Loaded {len(data)} values from data.json')
+        self._log(f'Loaded {len(data)} values from {self.savefile}')
     
     def _clean(self):
         """
@@ -253,44 +298,66 @@ class WosJumpClock:
             entry.insert(0, str(n).rstrip('0').rstrip('.'))
         
         # cleanup current and desired levels
-        for building in POSSIBLE_BUILDINGS:
-            current_box = self.current_level_comboboxes[building]
-            desired_box = self.desired_level_comboboxes[building]
-            if current_box.get() == '':
-                current_box.set('24')
-            if desired_box.get() == '' or int(desired_box.get()) < int(current_box.get()):
-                desired_box.set(current_box.get())
-        
-        self.done = {(building, int(current_box.get())) for building, current_box in
-                     self.current_level_comboboxes.items()}
-        
-        # use the dependecies to calculate the missing upgrades
-        todo = [(building, int(desired_box.get()))
-                for building, desired_box in self.desired_level_comboboxes.items()
-                if (building, int(desired_box.get())) not in self.done]
-        
-        # only add to the ordered_todo if all dependencies are met or already in ordered_todo
-        self.ordered_todo.clear()
-        while todo:
-            building, level = todo.pop()
-            not_missing = self.done | set(self.ordered_todo)
-            if (building, level) in not_missing:
-                continue
-            deps = set(depends_on(building, level))
-            missing = deps - not_missing
-            if not missing:
-                self.ordered_todo.append((building, level))
-                # update desires
-                if level > int(self.desired_level_comboboxes[building].get()):
-                    self.desired_level_comboboxes[building].set(str(level))
-            else:
-                todo.append((building, level))
-                todo.extend(missing)
+        current, desired = self.level_picker.get(CURRENT), self.level_picker.get(DESIRED)
+        for building in current:
+            if current[building] == '':
+                self.level_picker.set(CURRENT, building, min(levels(building), default=0))
+            if desired[building] == '' or int(desired[building]) < int(current[building]):
+                self.level_picker.set(DESIRED, building, current[building])
+        
+        self._plan()
         
         print(' '.join(f'{building[0]}{level}' for building, level in self.ordered_todo))
         
         self._log('Cleaned up entries')
     
+    def _plan(self):
+        """
+        Bring the plan up to date with the level comboboxes, reusing the previous plan.
+        
+        :return: False if the levels can't be read (e.g. while the user is still typing), True otherwise
+        """
+        try:
+            current = {building: int(level) for building, level in self.level_picker.get(CURRENT).items()}
+            desired = {building: int(level) for building, level in self.level_picker.get(DESIRED).items()}
+        except ValueError:
+            return False
+        if not all(level in levels(building) for building, level in [*current.items(), *desired.items()]):
+            return False
+        
+        self.planner.update(current, desired)
+        self.ordered_todo = self.planner.ordered_todo
+        self.done = self.planner.done
+        
+        # update desires
+        for building, level in self.ordered_todo:
+            if level > desired.get(building, level):
+                self.level_picker.set(DESIRED, building, level)
+        return True
+    
+    def _traced_var(self):
+        var = tk.StringVar(self.root)
+        var.trace_add('write', self._schedule_replan)
+        return var
+    
+    def _schedule_replan(self, *_):
+        """
+        Any edit of a level, resource or bonus ends up here.
+        Bursts of edits (like setting all levels at once) are coalesced into a single replan once Tk is idle.
+        """
+        if self._replan_pending is None:
+            self._replan_pending = self.root.after_idle(self._replan)
+    
+    def _replan(self):
+        self._replan_pending = None
+        if not self._plan():
+            return
+        try:
+            self.table_frame.update_table()
+        except (ValueError, IndexError):
+            # to_units/float on an empty or half-typed entry
+            self._log('Waiting for valid resources and bonuses')
+    
     def _calculate(self):
         """
         This is the meat and potatoes of the program.
@@ -302,17 +369,26 @@ class WosJumpClock:
         self.table_frame.update_table()
     
     def _update_all_current_levels(self, *_):
-        current_level = self.current_level_var.get()
-        for combobox in self.current_level_comboboxes.values():
-            combobox.set(current_level)
+        try:
+            current_level = self.current_level_var.get()
+        except tk.TclError:
+            return
+        self.level_picker.set_all(CURRENT, current_level)
     
     def _update_all_desired_levels(self, *_):
-        desired_level = self.desired_level_var.get()
-        for combobox in self.desired_level_comboboxes.values():
-            combobox.set(desired_level)
+        try:
+            desired_level = self.desired_level_var.get()
+        except tk.TclError:
+            return
+        self.level_picker.set_all(DESIRED, desired_level)
     
-    def _exit(self, _):
-        self.root.quit()
+    def set_visible(self, visible: bool):
+        """
+        Hidden profiles keep planning, but their table is only rendered once they are shown again.
+        """
+        self.visible = visible
+        if visible:
+            self.table_frame.show()
     
     @property
     def construction_speed(self):
@@ -358,11 +434,86 @@ class WosJumpClock:
         speedups += int(self.resources['General Speedups (min)'].get())
         return {'Meat': meat, 'Wood': wood, 'Coal': coal, 'Iron': iron, 'Crystal': crystal, 'RFC': rfc,
                 'Speedups': speedups}
+    
+    @property
+    def income_dict(self):
+        """
+        The expected resource income per hour.
+        """
+        return {resource: to_units(self.resources[f'{resource} Income/h'].get())
+                for resource in ['Meat', 'Wood', 'Coal', 'Iron']}
+
+
+class ProfileTabs(ttk.Notebook):
+    """
+    One tab per account profile. The cost data and prerequisites are loaded once and shared by all profiles; each
+    profile only holds its own levels, plan, status and save files.
+    """
+    
+    def __init__(self, root: tk.Tk, profiles: list[str], clock: Clock):
+        super().__init__(root)
+        self.clock = clock
+        self.profiles: dict[str, WosJumpClock] = {}
+        for profile in dict.fromkeys(profiles):
+            frame = tk.Frame(self)
+            self.add(frame, text=profile)
+            self.profiles[profile] = WosJumpClock(frame, clock, profile)
+        
+        self._tab_changed(None)
+        
+        # BINDINGS
+        self.bind('<<NotebookTabChanged>>', self._tab_changed)
+        root.bind("<Escape>", self._exit)
+        if isinstance(self.clock, SimulatedClock):
+            root.bind("<F8>", self._jump_to_next_event)
+    
+    @property
+    def selected_profile(self) -> WosJumpClock:
+        return self.profiles[self.tab(self.select(), 'text')]
+    
+    def _tab_changed(self, _):
+        selected = self.selected_profile
+        for profile in self.profiles.values():
+            if profile is not selected:
+                profile.set_visible(False)
+        selected.set_visible(True)
+    
+    def _exit(self, _):
+        self.quit()
+    
+    def _jump_to_next_event(self, _):
+        """
+        Simulation mode only: skip the clock ahead to the next upgrade ETA or countdown end.
+        """
+        due = self.clock.jump_to_next_event()
+        if due is None:
+            self.selected_profile._log('No upcoming events')
+        else:
+            self.selected_profile._log(f'Jumped to {due.strftime("%Y-%m-%d %H:%M:%S")}')
 
 
 def main():
+    parser = argparse.ArgumentParser(description='A countdown timer for Whiteout Survival')
+    parser.add_argument('--profile', action='append', dest='profiles', default=None, type=profile_name,
+                        help=f'account profile to open in its own tab, can be repeated (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='simulation mode: run the clock this many times faster than real time (F8 jumps to '
+                             'the next event)')
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, default=None,
+                        help='simulation mode: start time in ISO format (default: now)')
+    args = parser.parse_args()
+    
+    clock = Clock()
+    if args.speed is not None or args.start is not None:
+        clock = SimulatedClock(start=args.start, speed=args.speed or 1)
+    
+    validate_data.main()
+    
     root = tk.Tk()
-    _ = WosJumpClock(root)
+    root.title("WOS Jump Clock")
+    root.state("zoomed")
+    tabs = ProfileTabs(root, args.profiles or [DEFAULT_PROFILE], clock)
+    tabs.pack(fill='both', expand=True)
     root.mainloop()
 
 
@@ -0,0 +1,193 @@
+import heapq
+
+from src.data.dependencies import depends_on, required_by
+
+# Types
+UPGRADE = tuple[str, int]
+
+
+class Planner:
+    """
+    Keeps the upgrade plan in sync with the current and desired levels.
+    Every desired level is a target, and the plan is every upgrade a target is still missing.
+    Each planned upgrade counts what keeps it in the plan: being a target, and every planned upgrade that depends on it.
+    An edit only walks the upgrades whose count drops to or rises from zero, so the parts of the tree that are shared
+    between targets are never walked again, and an edit costs as much as the part of the plan it changes.
+    The new plan keeps the order of the previous one wherever the dependencies allow it.
+    """
+    
+    def __init__(self, ordered_todo: list[UPGRADE] | None = None):
+        self.current: dict[str, int] = {}
+        self.desired: dict[str, int] = {}
+        self.needed: dict[UPGRADE, int] = {}  # planned upgrade -> number of reasons to keep it
+        self.ordered_todo: list[UPGRADE] = list(ordered_todo or [])
+        self._stale_order = True  # the previous order comes from a save, not from self.needed
+    
+    def is_done(self, upgrade: UPGRADE) -> bool:
+        building, level = upgrade
+        return level <= self.current.get(building, 0)
+    
+    @property
+    def done(self) -> set[UPGRADE]:
+        return {(building, level)
+                for building, current in self.current.items()
+                for level in range(1, current + 1)}
+    
+    def _add(self, upgrade: UPGRADE, count: int, base: dict[UPGRADE, int], added: list[UPGRADE]):
+        """
+        Add count reasons to an upgrade, and put it in the plan with its prerequisites if it wasn't there yet.
+        base holds the reasons an upgrade already has while it is not planned (see update).
+        """
+        stack = [(upgrade, count)]
+        while stack:
+            upgrade, count = stack.pop()
+            if upgrade in self.needed:
+                self.needed[upgrade] += count
+                continue
+            self.needed[upgrade] = count + base.get(upgrade, 0)
+            added.append(upgrade)
+            stack.extend((dep, 1) for dep in depends_on(*upgrade) if not self.is_done(dep))
+    
+    def _remove(self, upgrade: UPGRADE):
+        """
+        Take an upgrade out of the plan, and release its prerequisites that have no other reason to stay.
+        """
+        stack = [upgrade]
+        while stack:
+            upgrade = stack.pop()
+            if self.needed.pop(upgrade, None) is None:
+                continue
+            for dep in depends_on(*upgrade):
+                if dep in self.needed:
+                    self.needed[dep] -= 1
+                    if self.needed[dep] == 0:
+                        stack.append(dep)
+    
+    def _release(self, upgrade: UPGRADE):
+        self.needed[upgrade] -= 1
+        if self.needed[upgrade] == 0:
+            self._remove(upgrade)
+    
+    def update(self, current: dict[str, int], desired: dict[str, int]) -> bool:
+        """
+        Replan after an edit of the current and/or desired levels.
+        
+        :param current: the current level of every building (or research)
+        :param desired: the desired level of every building (or research)
+        :return: whether the plan changed
+        """
+        if current == self.current and desired == self.desired:
+            return False
+        old_current, old_desired = self.current, self.desired
+        self.current = dict(current)
+        
+        # upgrades that got done leave the plan, together with what only they needed
+        undone = []
+        for building in old_current.keys() | self.current.keys():
+            old_level, level = old_current.get(building, 0), self.current.get(building, 0)
+            for done_level in range(old_level + 1, level + 1):
+                self._remove((building, done_level))
+            undone.extend((building, undone_level) for undone_level in range(level + 1, old_level + 1))
+        
+        # upgrades that are no longer done are planned again if a target or a planned upgrade needs them
+        base = {}
+        for upgrade in undone:
+            reasons = sum(dependent in self.needed for dependent in required_by().get(upgrade, ()))
+            reasons += old_desired.get(upgrade[0]) == upgrade[1]
+            if reasons:
+                base[upgrade] = reasons
+        added = []
+        for upgrade in base:
+            self._add(upgrade, 0, base, added)
+        
+        self.desired = dict(desired)
+        for building in old_desired.keys() | self.desired.keys():
+            old_target, target = (building, old_desired.get(building)), (building, self.desired.get(building))
+            if old_target == target:
+                continue
+            if old_target[1] is not None and not self.is_done(old_target):
+                self._release(old_target)
+            if target[1] is not None and not self.is_done(target):
+                self._add(target, 1, {}, added)
+        
+        if self._stale_order:
+            ordered_todo = self._order(self.needed.keys())
+            self._stale_order = False
+        else:
+            ordered_todo = self._insert(added)
+        if ordered_todo == self.ordered_todo:
+            return False
+        self.ordered_todo = ordered_todo
+        return True
+    
+    def _insert(self, added: list[UPGRADE]) -> list[UPGRADE]:
+        """
+        Keep the previous order of what is still planned, and fit in the upgrades that are new to the plan.
+        A new upgrade that a planned one depends on goes right before it, pulling along what it needs in turn; the
+        other new upgrades go at the end, lowest level first.
+        """
+        rank = {upgrade: i for i, upgrade in enumerate(self.ordered_todo)}
+        # an upgrade that left the plan and came back in the same update keeps its place, like any other known one
+        new = {upgrade for upgrade in added if upgrade in self.needed and upgrade not in rank}
+        pulls = {dependent for upgrade in new for dependent in required_by().get(upgrade, ())
+                 if dependent in self.needed and dependent not in new}
+        
+        ordered_todo = []
+        visited = set()
+        for upgrade in self.ordered_todo:
+            if upgrade not in self.needed or upgrade in visited:
+                continue
+            visited.add(upgrade)
+            if upgrade not in pulls:
+                ordered_todo.append(upgrade)
+                continue
+            # depth first, so everything goes after what it depends on
+            stack = [(upgrade, True)]
+            stack.extend((dep, False) for dep in self._unvisited_deps(upgrade, visited, rank))
+            while stack:
+                upgrade, ready = stack.pop()
+                if ready:
+                    ordered_todo.append(upgrade)
+                elif upgrade not in visited:
+                    visited.add(upgrade)
+                    stack.append((upgrade, True))
+                    stack.extend((dep, False) for dep in self._unvisited_deps(upgrade, visited, rank))
+        return ordered_todo + self._order(new - visited)
+    
+    def _unvisited_deps(self, upgrade: UPGRADE, visited: set[UPGRADE], rank: dict[UPGRADE, int]) -> list[UPGRADE]:
+        """
+        :return: the planned prerequisites of an upgrade that are not placed yet, the one to place first at the end
+        """
+        deps = [dep for dep in depends_on(*upgrade) if dep in self.needed and dep not in visited]
+        return sorted(deps, key=lambda dep: (rank.get(dep, len(rank)), dep[1], dep[0]), reverse=True)
+    
+    def _order(self, needed) -> list[UPGRADE]:
+        """
+        Topologically sort the needed upgrades, preferring the position they had in the previous plan.
+        Upgrades that are new to the plan go after the known ones, lowest level first.
+        """
+        needed = set(needed)
+        rank = {upgrade: i for i, upgrade in enumerate(self.ordered_todo) if upgrade in needed}
+        new = sorted((upgrade for upgrade in needed if upgrade not in rank),
+                     key=lambda upgrade: (upgrade[1], upgrade[0]))
+        rank.update((upgrade, len(self.ordered_todo) + i) for i, upgrade in enumerate(new))
+        
+        blocking = dict.fromkeys(needed, 0)
+        unlocks: dict[UPGRADE, list[UPGRADE]] = {}
+        for upgrade in needed:
+            for dep in depends_on(*upgrade):
+                if dep in blocking:
+                    blocking[upgrade] += 1
+                    unlocks.setdefault(dep, []).append(upgrade)
+        
+        heap = [(rank[upgrade], upgrade) for upgrade, n in blocking.items() if n == 0]
+        heapq.heapify(heap)
+        ordered_todo = []
+        while heap:
+            _, upgrade = heapq.heappop(heap)
+            ordered_todo.append(upgrade)
+            for next_upgrade in unlocks.get(upgrade, ()):
+                blocking[next_upgrade] -= 1
+                if blocking[next_upgrade] == 0:
+                    heapq.heappush(heap, (rank[next_upgrade], next_upgrade))
+        return ordered_todo
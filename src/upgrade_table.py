@@ -4,6 +4,7 @@ from math import ceil
 
 from src.data.constants import *
 from src.data.dependencies import depends_on
+from src.exchange import RESOURCES, describe, plan_cover, solve, unit_costs
 from src.time_conversions import from_minutes, to_minutes
 from src.unit_conversions import to_units
 
@@ -12,23 +13,37 @@ EXPLANATION = """
         Duration is the result of the formula: base_duration * (1/(1+construction_speed)) * (1-bonus_1) * ...
         Status will be modifiable if the upgrade is available. To start an upgrade, simply enter the current indicated ETA (XdYhZm) in the field.
         GREEN: Done, RED: Locked, WHITE: Available, BLUE: In Progress
+        Exchange Cost is the cheapest way to cover the missing resources (see data/exchange_rates.csv), per upgrade and cumulative.
         """
 
 HEADERS = [COLUMN_BUILDING, COLUMN_LEVEL, COLUMN_MEAT, COLUMN_WOOD, COLUMN_COAL, COLUMN_IRON, COLUMN_CRYSTAL,
-           COLUMN_RFC, 'Base Duration', COLUMN_DURATION, 'Status', 'Confirm Status', 'ETA']
+           COLUMN_RFC, 'Base Duration', COLUMN_DURATION, 'Status', 'Confirm Status', 'ETA', 'Exchange Cost',
+           'Cumulative Exchange']
+
+# planned upgrades without a row in data.csv (e.g. research that wasn't ingested yet) are shown as unknown, and count
+# as free and instant in the totals
+UNKNOWN = '?'
+NO_COST = {COLUMN_MEAT: 0, COLUMN_WOOD: 0, COLUMN_COAL: 0, COLUMN_IRON: 0, COLUMN_CRYSTAL: 0, COLUMN_RFC: 0,
+           COLUMN_DURATION: UNKNOWN, COLUMN_MINUTES: 0}
 
 
 class UpgradeTable(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent.root)
         self.parent = parent
-        self.cost_data = parent.cost_data
-        self.seconds = None
+        self.cost_index = parent.cost_index
+        self.clock = parent.clock
+        self.countdown_end = None
+        self.ticking = False
+        self.eta_events = set()
+        self.dirty = False
+        self.covers = []  # the previous plan_cover result, so only the rows after an edit are solved again
         
         # WIDGETS
         self.explanation = tk.Label(self, text=EXPLANATION, justify='left')
         self.headers = {header: tk.Label(self, text=header, borderwidth=1, relief="solid") for header in HEADERS}
         self.upgrade_widgets = {}
+        self.row_texts = {}
         self.refresh_button = tk.Button(self, text='↻', command=self.update_table)
         self.countdown_label = tk.Label(self, text='Countdown')
         
@@ -39,81 +54,88 @@ class UpgradeTable(tk.Frame):
         [self.headers[h].grid(row=1, column=col + 1, sticky="nsew") for col, h in enumerate(HEADERS)]
     
     def update_table(self):
+        """
+        Bring the table in line with the parent's plan.
+        Rows are kept across updates: only upgrades that are new to the plan get widgets, rows that left the plan are
+        destroyed, and labels are only reconfigured when their text changes.
+        """
+        # a hidden profile is only rendered once it is shown again
+        if not self.parent.visible:
+            self.dirty = True
+            return
+        self.dirty = False
+        
         ordered_todo = self.parent.ordered_todo
         status = self.parent.status
-        done = self.parent.done
         
-        # if any widgets are missing, we need to recreate the whole table
-        if any([upgrade not in self.upgrade_widgets for upgrade in ordered_todo]):
-            [widget.destroy()
-             for widgets in self.upgrade_widgets.values()
-             for widget in widgets.values()]
-            self.upgrade_widgets = {}
+        # read all inputs first, so invalid input leaves the table untouched
+        zinman_skill = self.parent.zinman_skill
+        speed = self.parent.construction_speed * self.parent.bonus_speed
+        resources = self.parent.resources_dict
+        income = self.parent.income_dict
+        
+        # remove the rows that are no longer part of the plan
+        for upgrade in self.upgrade_widgets.keys() - set(ordered_todo):
+            [widget.destroy() for widget in self.upgrade_widgets.pop(upgrade).values()]
+            self.row_texts.pop(upgrade, None)
         
         totals = [0] * 7  # meat, wood, coal, iron, crystal, rfc, duration
+        no_costs = []
+        needs = []
+        start_minutes = []
         for i, upgrade in enumerate(ordered_todo):
-            # we can assume the widget is either already in the right place, or not there at all
             building, level = upgrade
-            if upgrade in status and upgrade in self.upgrade_widgets:
-                # just update the status
-                self.update_status(upgrade)
-                continue
-            
-            row = self.cost_data[(self.cost_data['Building'] == building) & (self.cost_data['Level'] == level)]
-            meat = row[COLUMN_MEAT].values[0]
-            wood = row[COLUMN_WOOD].values[0]
-            coal = row[COLUMN_COAL].values[0]
-            iron = row[COLUMN_IRON].values[0]
-            crystal = row[COLUMN_CRYSTAL].values[0]
-            rfc = row[COLUMN_RFC].values[0]
-            base_duration = row[COLUMN_DURATION].values[0]
-            minutes = row[COLUMN_MINUTES].values[0]
+            row = self.cost_index.get(upgrade)
+            if row is None:
+                no_costs.append(upgrade)
+                row = NO_COST
+            meat = row[COLUMN_MEAT]
+            wood = row[COLUMN_WOOD]
+            coal = row[COLUMN_COAL]
+            iron = row[COLUMN_IRON]
+            crystal = row[COLUMN_CRYSTAL]
+            rfc = row[COLUMN_RFC]
+            minutes = row[COLUMN_MINUTES]
             
             # rss cost reduction
-            meat = ceil(to_units(meat) * self.parent.zinman_skill)
-            wood = ceil(to_units(wood) * self.parent.zinman_skill)
-            coal = ceil(to_units(coal) * self.parent.zinman_skill)
-            iron = ceil(to_units(iron) * self.parent.zinman_skill)
+            meat = ceil(to_units(meat) * zinman_skill)
+            wood = ceil(to_units(wood) * zinman_skill)
+            coal = ceil(to_units(coal) * zinman_skill)
+            iron = ceil(to_units(iron) * zinman_skill)
             
             # speed
-            discounted_minutes = minutes * self.parent.construction_speed * self.parent.bonus_speed
+            discounted_minutes = minutes * speed
             duration = from_minutes(ceil(discounted_minutes))
             
-            widgets = {
-                'index_label': tk.Label(self, text=str(i + 1)),
-                'building_label': tk.Label(self, text=building),
-                'level_label': tk.Label(self, text=level),
-                'meat_label': tk.Label(self, text=meat),
-                'wood_label': tk.Label(self, text=wood),
-                'coal_label': tk.Label(self, text=coal),
-                'iron_label': tk.Label(self, text=iron),
-                'crystal_label': tk.Label(self, text=crystal),
-                'rfc_label': tk.Label(self, text=rfc),
-                'base_duration_label': tk.Label(self, text=base_duration),
-                'duration_label': tk.Label(self, text=duration),
-                'status': tk.Entry(self),
-                'confirm_status': tk.Button(self, text="Confirm", command=self._confirm_status(upgrade)),
-                'eta': tk.Label(self),
+            if upgrade not in self.upgrade_widgets:
+                self._create_row(upgrade)
+            widgets = self.upgrade_widgets[upgrade]
+            
+            texts = {
+                'index_label': i + 1,
+                'meat_label': meat,
+                'wood_label': wood,
+                'coal_label': coal,
+                'iron_label': iron,
+                'duration_label': duration,
             }
-            assert len(widgets) == len(HEADERS) + 1, f'{len(widgets)=} != {len(HEADERS)=}'
-            self.upgrade_widgets[upgrade] = widgets
+            if row is NO_COST:
+                texts.update(dict.fromkeys(['meat_label', 'wood_label', 'coal_label', 'iron_label', 'duration_label'],
+                                           UNKNOWN))
+            previous = self.row_texts.get(upgrade, {})
+            for name, text in texts.items():
+                if previous.get(name) != text:
+                    widgets[name].config(text=text)
+            
+            # LAYOUT (only if the row moved)
+            if previous.get('index_label') != i + 1:
+                [widget.grid(row=i + 2, column=col) for col, widget in enumerate(widgets.values())]
+            self.row_texts[upgrade] = {**previous, **texts}
             self.update_status(upgrade)
             
-            # LAYOUT
-            widgets['index_label'].grid(row=i + 2, column=0)
-            widgets['building_label'].grid(row=i + 2, column=1)
-            widgets['level_label'].grid(row=i + 2, column=2)
-            widgets['meat_label'].grid(row=i + 2, column=3)
-            widgets['wood_label'].grid(row=i + 2, column=4)
-            widgets['coal_label'].grid(row=i + 2, column=5)
-            widgets['iron_label'].grid(row=i + 2, column=6)
-            widgets['crystal_label'].grid(row=i + 2, column=7)
-            widgets['rfc_label'].grid(row=i + 2, column=8)
-            widgets['base_duration_label'].grid(row=i + 2, column=9)
-            widgets['duration_label'].grid(row=i + 2, column=10)
-            widgets['status'].grid(row=i + 2, column=11)
-            widgets['confirm_status'].grid(row=i + 2, column=12)
-            widgets['eta'].grid(row=i + 2, column=13)
+            # remember what the upgrade needs, and when it starts (one builder, in plan order)
+            needs.append(dict(zip(RESOURCES, [meat, wood, coal, iron, crystal, rfc])))
+            start_minutes.append(totals[6])
             
             # tally the totals
             totals[0] += meat
@@ -127,11 +149,51 @@ class UpgradeTable(tk.Frame):
             else:
                 eta = datetime.datetime.fromtimestamp(status[upgrade]['Confirmed Time']) + datetime.timedelta(
                     minutes=status[upgrade]['minutes'])
-                remaining_duration = ceil((eta - datetime.datetime.now()).total_seconds() / 60)
+                remaining_duration = ceil((eta - self.clock.now()).total_seconds() / 60)
                 totals[6] += remaining_duration
         
+        # cover the missing resources along the plan
+        covers = plan_cover(needs, start_minutes, {r: resources[r] for r in RESOURCES}, income,
+                            previous=self.covers)
+        self.covers = covers
+        for upgrade, cover in zip(ordered_todo, covers):
+            widgets = self.upgrade_widgets[upgrade]
+            texts = {
+                'exchange_label': f'{cover["upgrade_cost"]:,.0f}',
+                'cumulative_exchange_label': f'{cover["cost"]:,.0f}',
+            }
+            previous = self.row_texts[upgrade]
+            for name, text in texts.items():
+                if previous.get(name) != text:
+                    widgets[name].config(text=text)
+            previous.update(texts)
+        
         # update the totals
-        self.update_totals(totals)
+        self.update_totals(totals, resources, covers[-1] if covers else solve({}, {}), no_costs)
+    
+    def _create_row(self, upgrade):
+        building, level = upgrade
+        row = self.cost_index.get(upgrade)
+        widgets = {
+            'index_label': tk.Label(self),
+            'building_label': tk.Label(self, text=building),
+            'level_label': tk.Label(self, text=level),
+            'meat_label': tk.Label(self),
+            'wood_label': tk.Label(self),
+            'coal_label': tk.Label(self),
+            'iron_label': tk.Label(self),
+            'crystal_label': tk.Label(self, text=UNKNOWN if row is None else row[COLUMN_CRYSTAL]),
+            'rfc_label': tk.Label(self, text=UNKNOWN if row is None else row[COLUMN_RFC]),
+            'base_duration_label': tk.Label(self, text=UNKNOWN if row is None else row[COLUMN_DURATION]),
+            'duration_label': tk.Label(self),
+            'status': tk.Entry(self),
+            'confirm_status': tk.Button(self, text="Confirm", command=self._confirm_status(upgrade)),
+            'eta': tk.Label(self),
+            'exchange_label': tk.Label(self),
+            'cumulative_exchange_label': tk.Label(self),
+        }
+        assert len(widgets) == len(HEADERS) + 1, f'{len(widgets)=} != {len(HEADERS)=}'
+        self.upgrade_widgets[upgrade] = widgets
     
     def _confirm_status(self, upgrade):
         def confirm():
@@ -142,14 +204,39 @@ class UpgradeTable(tk.Frame):
             minutes = to_minutes(status)
             self.parent.status.setdefault(upgrade, {})
             self.parent.status[upgrade]['minutes'] = minutes
-            self.parent.status[upgrade]['Confirmed Time'] = datetime.datetime.now().timestamp()
+            self.parent.status[upgrade]['Confirmed Time'] = self.clock.now().timestamp()
             self.update_status(upgrade)
         
         return confirm
     
+    def _eta_reached(self, eta):
+        self.eta_events.discard(eta)
+        self.update_table()
+    
+    def _status_key(self, upgrade):
+        """
+        :return: everything the status cell of an upgrade depends on, so it is only touched when this changes
+        """
+        done = self.parent.done
+        if upgrade in done:
+            return 'Done'
+        if any(dep not in done for dep in depends_on(*upgrade)):
+            return 'Locked'
+        status = self.parent.status.get(upgrade)
+        if status is None:
+            return 'Available'
+        eta = datetime.datetime.fromtimestamp(status['Confirmed Time']) + datetime.timedelta(minutes=status['minutes'])
+        return eta, ceil((eta - self.clock.now()).total_seconds() / 60)
+    
     def update_status(self, upgrade):
         if upgrade not in self.upgrade_widgets:
             return
+        # unchanged cells are left alone, which also keeps an ETA the user is still typing
+        key = self._status_key(upgrade)
+        texts = self.row_texts.setdefault(upgrade, {})
+        if texts.get('status') == key:
+            return
+        texts['status'] = key
         
         # no matter what, check the dependencies, and update the activity of the status widget and confirm button
         building, level = upgrade
@@ -188,7 +275,13 @@ class UpgradeTable(tk.Frame):
         minutes = self.parent.status[upgrade]['minutes']
         
         eta = conf + datetime.timedelta(minutes=minutes)
-        remaining_duration = ceil((eta - datetime.datetime.now()).total_seconds() / 60)
+        now = self.clock.now()
+        remaining_duration = ceil((eta - now).total_seconds() / 60)
+        
+        # refresh the table when the upgrade finishes
+        if eta > now and eta not in self.eta_events:
+            self.eta_events.add(eta)
+            self.clock.at(self, eta, lambda: self._eta_reached(eta))
         
         assert self.upgrade_widgets[upgrade]['status'].cget('state') == 'normal'
         self.upgrade_widgets[upgrade]['status'].delete(0, 'end')
@@ -196,41 +289,55 @@ class UpgradeTable(tk.Frame):
         
         self.upgrade_widgets[upgrade]['eta'].config(text=eta.strftime("%Y-%m-%d %H:%M:%S"))
     
-    def update_totals(self, totals):
+    def update_totals(self, totals, parent_resources_dict, cover, no_costs=()):
+        """
+        :param cover: the cheapest way to cover the missing resources of the whole plan (see exchange.plan_cover)
+        :param no_costs: the planned upgrades that have no cost data, and are left out of the totals
+        """
         meat, wood, coal, iron, crystal, rfc, duration = totals
         
-        # meat and wood are worth 1, coal is worth 5 and iron is worth 20
-        rss = meat + wood + coal * 5 + iron * 20
+        # the total is what the whole plan would cost if everything had to be exchanged
+        costs = unit_costs()
+        rss = sum(amount * costs.get(resource, 0) for resource, amount in zip(RESOURCES, [meat, wood, coal, iron]))
         
-        parent_resources_dict = self.parent.resources_dict
-        missing_meat = max(0, meat - parent_resources_dict['Meat'])
-        missing_wood = max(0, wood - parent_resources_dict['Wood'])
-        missing_coal = max(0, coal - parent_resources_dict['Coal'])
-        missing_iron = max(0, iron - parent_resources_dict['Iron'])
-        missing_crystal = max(0, crystal - parent_resources_dict['Crystal'])
-        missing_rfc = max(0, rfc - parent_resources_dict['RFC'])
         missing_speedups = max(0, duration - parent_resources_dict['Speedups'])
         
-        missing_rss = missing_meat + missing_wood + missing_coal * 5 + missing_iron * 20 + missing_crystal
-        
         # update the totals (for now in the explanation label)
         self.explanation.config(text=f'{EXPLANATION}'
-                                     f'Total RSS: {rss:,}, Total Duration: {from_minutes(duration)}'
-                                     f'Missing RSS: {missing_rss:,}, Missing Speedups: {from_minutes(missing_speedups)}')
+                                     f'Total RSS: {rss:,.0f}, Total Duration: {from_minutes(duration)}'
+                                     f'Missing RSS: {cover["cost"]:,.0f} ({describe(cover) or "none"}), '
+                                     f'Missing Speedups: {from_minutes(missing_speedups)}'
+                                     + (f'\nNo cost data for: {", ".join(f"{b} {l}" for b, l in no_costs)}'
+                                        if no_costs else ''))
         
         # update the countdown
-        if self.seconds is None:
-            self.seconds = ceil(missing_speedups * 60)
+        if self.countdown_end is None:
+            self.countdown_end = self.clock.now() + datetime.timedelta(minutes=missing_speedups)
+            # the ticks do the actual work, but a simulated clock should be able to jump to the end
+            self.clock.mark_event(self, self.countdown_end)
+            self.update_countdown()
+
+    def show(self):
+        if self.dirty:
+            self.update_table()
+        if not self.ticking:
             self.update_countdown()
 
     def update_countdown(self):
-        if self.seconds is None:
+        """
+        The remaining time is always read from the clock, so skipped or coalesced ticks don't drift.
+        The ticks stop while the profile is hidden, and show() picks them up again.
+        """
+        self.ticking = False
+        if self.countdown_end is None or not self.parent.visible:
             return
         
-        self.seconds -= 1
-        minutes, seconds = divmod(self.seconds, 60)
+        remaining = max(0, ceil((self.countdown_end - self.clock.now()).total_seconds()))
+        minutes, seconds = divmod(remaining, 60)
         self.countdown_label.config(text=f'{from_minutes(minutes)} {seconds:02d}')
-        if self.seconds == 0:
+        if remaining == 0:
             self.update_table()
-            self.seconds = None
-        self.after(1000, self.update_countdown)
\ No newline at end of file
+            self.countdown_end = None
+            return
+        self.ticking = True
+        self.clock.after(self, 1000, self.update_countdown)
\ No newline at end of file
@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+
+from src import clock as clock_module
+from src.clock import SimulatedClock
+
+START = datetime.datetime(2025, 1, 1)
+
+
+class FakeWidget:
+    """
+    Records the Tk wake-ups instead of running them; tests fire them by hand.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def after(self, ms, callback):
+        self.calls.append((ms, callback))
+        return f'after#{len(self.calls)}'
+
+
+@pytest.fixture
+def real_time(monkeypatch):
+    """
+    Freeze the real clock, so simulated time only moves when a test says so.
+    """
+    now = [0.0]
+    monkeypatch.setattr(clock_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_now_runs_speed_times_faster(real_time):
+    clock = SimulatedClock(start=START, speed=60)
+    real_time[0] += 10
+    assert clock.now() == START + datetime.timedelta(minutes=10)
+
+
+def test_wake_up_is_scaled_to_real_time(real_time):
+    clock = SimulatedClock(start=START, speed=1000)
+    widget = FakeWidget()
+    clock.at(widget, START + datetime.timedelta(seconds=10), lambda: None)
+    clock.after(widget, 0, lambda: None)
+    assert [ms for ms, _ in widget.calls] == [10, 1]
+
+
+def test_advance_runs_due_timers_in_order(real_time):
+    clock = SimulatedClock(start=START, speed=1)
+    widget = FakeWidget()
+    ran = []
+    clock.at(widget, START + datetime.timedelta(minutes=2), lambda: ran.append('second'))
+    clock.at(widget, START + datetime.timedelta(minutes=1), lambda: ran.append('first'))
+    clock.after(widget, 3 * 60 * 1000, lambda: ran.append('tick'))
+
+    clock.advance(datetime.timedelta(seconds=90))
+    assert ran == ['first']
+    clock.advance(datetime.timedelta(minutes=2))
+    assert ran == ['first', 'second', 'tick']
+
+    # the Tk wake-ups find nothing left to run
+    for _, wake_up in widget.calls:
+        wake_up()
+    assert ran == ['first', 'second', 'tick']
+
+
+def test_jump_to_next_event(real_time):
+    clock = SimulatedClock(start=START, speed=1)
+    widget = FakeWidget()
+    assert clock.jump_to_next_event() is None
+
+    ran = []
+    eta = START + datetime.timedelta(hours=5)
+    clock.at(widget, eta, lambda: ran.append('eta'))
+    clock.mark_event(widget, START + datetime.timedelta(hours=2))
+    clock.after(widget, 1000, lambda: ran.append('tick'))  # a tick is not an event
+
+    assert clock.next_event() == START + datetime.timedelta(hours=2)
+    assert clock.jump_to_next_event() == START + datetime.timedelta(hours=2)
+    assert clock.now() == START + datetime.timedelta(hours=2)
+    assert ran == ['tick']
+
+    assert clock.jump_to_next_event() == eta
+    assert clock.now() == eta
+    assert ran == ['tick', 'eta']
+    assert clock.jump_to_next_event() is None
+
+
+def test_jump_coalesces_ticks(real_time):
+    clock = SimulatedClock(start=START, speed=1)
+    widget = FakeWidget()
+    ticks = []
+
+    def tick():
+        ticks.append(clock.now())
+        clock.after(widget, 1000, tick)
+
+    tick()
+    clock.at(widget, START + datetime.timedelta(hours=1), lambda: None)
+    clock.jump_to_next_event()
+
+    # an hour of one-second ticks runs once at the jump, not 3600 times
+    assert ticks == [START, START + datetime.timedelta(hours=1)]
+    real_time[0] += 1
+    clock._run_due()
+    assert len(ticks) == 3
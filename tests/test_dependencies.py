@@ -0,0 +1,28 @@
+import csv
+
+from src.data import dependencies
+from src.data.constants import *
+
+
+def write_graph(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([COLUMN_BUILDING, COLUMN_LEVEL, COLUMN_REQUIRES, COLUMN_REQUIRED_LEVEL])
+        writer.writerows(rows)
+
+
+def test_building_levels_start_below_the_lowest_upgrade():
+    assert dependencies.levels(FURNACE) == tuple(range(24, 31))
+    assert dependencies.names()[:len(POSSIBLE_BUILDINGS)] == tuple(POSSIBLE_BUILDINGS)
+
+
+def test_names_that_are_only_required_get_levels(tmp_path):
+    # a root research node has no rows of its own, it only shows up in the Requires column
+    path = str(tmp_path / 'prerequisites.csv')
+    write_graph(path, [('Tooling', 1, 'Root', 1), ('Tooling', 2, 'Tooling', 1), ('Tooling', 2, 'Root', 2)])
+
+    assert dependencies.names(path)[len(POSSIBLE_BUILDINGS):] == ('Tooling', 'Root')
+    assert dependencies.levels('Root', path) == (0, 1, 2)
+    assert dependencies.levels('Tooling', path) == (0, 1, 2)
+    assert dependencies.levels('Unknown', path) == ()
+    assert 'Root' in dependencies.known_names(path)
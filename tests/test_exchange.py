@@ -0,0 +1,78 @@
+import pytest
+
+from src.exchange import exchange_rates, plan_cover, solve, unit_costs
+
+CHEST = 'Resource Chest'
+
+
+def test_default_rates_match_the_old_weights():
+    assert dict(unit_costs()) == {'Meat': 1, 'Wood': 1, 'Coal': 5, 'Iron': 20}
+
+    cover = solve({'Meat': 100, 'Wood': 100, 'Coal': 10, 'Iron': 10}, {'Meat': 40})
+    assert cover['cost'] == pytest.approx(60 + 100 + 5 * 10 + 20 * 10)
+    assert cover['exchanges'] == pytest.approx({(CHEST, 'Meat'): 60, (CHEST, 'Wood'): 100, (CHEST, 'Coal'): 50,
+                                                (CHEST, 'Iron'): 200})
+    assert cover['uncovered'] == {}
+
+
+def test_crystal_is_uncovered():
+    cover = solve({'Crystal': 500, 'Meat': 10}, {'Crystal': 100})
+    assert cover['uncovered'] == pytest.approx({'Crystal': 400})
+    assert cover['cost'] == pytest.approx(10)
+
+    # nothing else missing, so no exchanges at all
+    assert solve({'Crystal': 500}, {}) == {'cost': 0, 'exchanges': {}, 'uncovered': {'Crystal': 500}}
+
+
+def test_exchange_between_resources():
+    rates = exchange_rates() + (('Wood', 'Iron', 0.1, 0),)
+
+    # the spare wood covers the iron for free
+    cover = solve({'Iron': 10}, {'Wood': 1000})
+    assert cover['cost'] == pytest.approx(200)
+    cover = solve({'Iron': 10}, {'Wood': 1000}, rates)
+    assert cover['cost'] == pytest.approx(0)
+    assert cover['exchanges'] == pytest.approx({('Wood', 'Iron'): 100})
+
+    # without spare wood, buying wood for iron (1 / 0.1 = 10 per iron) beats buying iron (20 per iron)
+    cover = solve({'Iron': 10}, {}, rates)
+    assert cover['cost'] == pytest.approx(100)
+    assert unit_costs(rates)['Iron'] == pytest.approx(10)
+
+
+def test_profitable_cycle_raises():
+    rates = exchange_rates() + (('Meat', 'Wood', 2, 0), ('Wood', 'Meat', 1, 0))
+    with pytest.raises(ValueError):
+        solve({'Meat': 10}, {}, rates)
+    with pytest.raises(ValueError):
+        unit_costs(rates)
+
+
+def test_duplicate_pair_raises():
+    rates = exchange_rates() + (('Wood', 'Iron', 0.1, 0), ('Wood', 'Iron', 0.05, 0))
+    with pytest.raises(ValueError):
+        solve({'Iron': 10}, {'Wood': 1000}, rates)
+    with pytest.raises(ValueError):
+        plan_cover([{'Iron': 10}], [0], {'Wood': 1000}, {}, rates)
+
+
+def test_plan_cover_keeps_earlier_exchanges():
+    # the income catches up with the first upgrade, but what was bought for it stays bought
+    covers = plan_cover([{'Meat': 1000}, {'Meat': 10}], [0, 600], {'Meat': 0}, {'Meat': 100})
+    assert [cover['upgrade_cost'] for cover in covers] == pytest.approx([1000, 0])
+    assert [cover['cost'] for cover in covers] == pytest.approx([1000, 1000])
+
+
+def test_plan_cover_reuses_unchanged_rows():
+    needs = [{'Meat': 100 * i, 'Iron': 5 * i} for i in range(1, 6)]
+    start_minutes = [60 * i for i in range(5)]
+    stock = {'Meat': 200, 'Iron': 10}
+    income = {'Meat': 50, 'Iron': 1}
+    covers = plan_cover(needs, start_minutes, stock, income)
+
+    needs[3] = {'Meat': 1, 'Iron': 1}
+    updated = plan_cover(needs, start_minutes, stock, income, previous=covers)
+    assert updated[:3] == covers[:3]
+    assert all(a is b for a, b in zip(updated[:3], covers[:3]))
+    fresh = plan_cover(needs, start_minutes, stock, income)
+    assert [cover['cost'] for cover in updated] == pytest.approx([cover['cost'] for cover in fresh])
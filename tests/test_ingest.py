@@ -0,0 +1,62 @@
+import os
+import stat
+
+from src.data.constants import *
+from src.data.ingest import ingest, load_table, row_hash, write_table
+from src.data.validate_data import REQUIRED_COLUMNS
+
+HEADER = [col for col in REQUIRED_COLUMNS if col != COLUMN_MINUTES]
+
+
+def make_row(building, level, meat='1000', duration='18d 8h 22m'):
+    return {COLUMN_BUILDING: building, COLUMN_LEVEL: str(level), COLUMN_MEAT: meat, COLUMN_WOOD: '2000',
+            COLUMN_COAL: '300', COLUMN_IRON: '40', COLUMN_CRYSTAL: '5', COLUMN_RFC: '0', COLUMN_DURATION: duration,
+            COLUMN_SVS: '100', COLUMN_MINUTES: '26422'}
+
+
+def write_export(path, rows):
+    """
+    A saved HTML page with a results table: a header row, then one row per upgrade behind a label cell.
+    """
+    lines = ['<html><body><table class="results">',
+             '<tr><th></th>' + ''.join(f'<th>{col}</th>' for col in HEADER) + '</tr>']
+    for i, row in enumerate(rows):
+        lines.append(f'<tr><td>{i}</td>' + ''.join(f'<td>{row[col]}</td>' for col in HEADER) + '</tr>')
+    lines.append('</table></body></html>')
+    path.write_text('\n'.join(lines), encoding='utf-8')
+
+
+def test_hashes_survive_a_round_trip(tmp_path):
+    data_file = str(tmp_path / 'data.csv')
+    rows = {(row[COLUMN_BUILDING], row[COLUMN_LEVEL]): row for row in [make_row(FURNACE, 25), make_row(EMBASSY, 25)]}
+    write_table(REQUIRED_COLUMNS, rows, data_file)
+
+    columns, loaded = load_table(data_file)
+    assert columns == REQUIRED_COLUMNS
+    assert {key: row_hash(row) for key, row in loaded.items()} == {key: row_hash(row) for key, row in rows.items()}
+
+
+def test_only_changed_rows_are_written(tmp_path):
+    data_file = str(tmp_path / 'data.csv')
+    write_table(REQUIRED_COLUMNS, {(FURNACE, '25'): make_row(FURNACE, 25), (EMBASSY, '25'): make_row(EMBASSY, 25)},
+                data_file)
+    os.chmod(data_file, 0o640)
+
+    export = tmp_path / 'export.html'
+    write_export(export, [make_row(FURNACE, 25), make_row(EMBASSY, 25, meat='1,500'), make_row(FURNACE, 26),
+                          make_row(MARKSMAN, 26, duration='18d 8.5h'), make_row(MARKSMAN, 27, meat='12M')])
+    report = ingest(str(export), data_file)
+
+    assert report['unchanged'] == [(FURNACE, '25')]
+    assert report['changed'] == [(EMBASSY, '25')]
+    assert report['added'] == [(FURNACE, '26')]
+    assert [key for key, _ in report['rejected']] == [(MARKSMAN, '26'), (MARKSMAN, '27')]
+
+    _, rows = load_table(data_file)
+    assert list(rows) == [(FURNACE, '25'), (EMBASSY, '25'), (FURNACE, '26')]
+    assert rows[EMBASSY, '25'][COLUMN_MEAT] == '1500'
+    assert stat.S_IMODE(os.stat(data_file).st_mode) == 0o640
+
+    # a second ingest of the same export changes nothing
+    report = ingest(str(export), data_file)
+    assert not report['added'] and not report['changed']
@@ -0,0 +1,92 @@
+import csv
+import random
+
+import pytest
+
+from src import planner
+from src.data import dependencies
+from src.data.constants import *
+from src.planner import Planner
+
+
+def walk(current, desired, depends_on):
+    """
+    The plan from scratch: every target and its prerequisites that are not done.
+    """
+    needed = set()
+    stack = list(desired.items())
+    while stack:
+        upgrade = stack.pop()
+        if upgrade in needed or upgrade[1] <= current.get(upgrade[0], 0):
+            continue
+        needed.add(upgrade)
+        stack.extend(depends_on(*upgrade))
+    return needed
+
+
+def check(p, current, desired, depends_on):
+    assert set(p.ordered_todo) == walk(current, desired, depends_on)
+    assert len(p.ordered_todo) == len(set(p.ordered_todo))
+    position = {upgrade: i for i, upgrade in enumerate(p.ordered_todo)}
+    for upgrade in p.ordered_todo:
+        for dep in depends_on(*upgrade):
+            if dep in position:
+                assert position[dep] < position[upgrade], (dep, upgrade)
+
+
+def fuzz(names, levels, depends_on, seed, steps=300):
+    rng = random.Random(seed)
+    current = {name: rng.choice(levels) for name in names}
+    desired = {name: max(level, rng.choice(levels)) for name, level in current.items()}
+    p = Planner()
+    p.update(current, desired)
+    check(p, current, desired, depends_on)
+    for _ in range(steps):
+        # several fields per update, like Validate or edits that pile up behind a half-typed value
+        current, desired = dict(current), dict(desired)
+        for name in rng.sample(names, rng.randint(1, 4)):
+            if rng.random() < 0.5:
+                current[name] = rng.choice(levels)
+            else:
+                desired[name] = rng.choice(levels)
+        p.update(current, desired)
+        check(p, current, desired, depends_on)
+
+
+def test_readded_upgrade_stays_after_its_prerequisite():
+    current = dict.fromkeys(POSSIBLE_BUILDINGS, 30)
+    desired = dict(current)
+    p = Planner()
+    p.update({**current, INFANTRY: 28}, {**desired, INFANTRY: 29})
+    p.update({**current, INFANTRY: 27}, {**desired, INFANTRY: 30})
+    assert p.ordered_todo == [(INFANTRY, 28), (INFANTRY, 29), (INFANTRY, 30)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_buildings_match_a_full_walk(seed):
+    fuzz(POSSIBLE_BUILDINGS, list(range(24, 31)), dependencies.depends_on, seed)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_research_tree_matches_a_full_walk(seed, tmp_path, monkeypatch):
+    rng = random.Random(seed)
+    names = [f'Research {i}' for i in range(30)]
+    path = str(tmp_path / 'prerequisites.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([COLUMN_BUILDING, COLUMN_LEVEL, COLUMN_REQUIRES, COLUMN_REQUIRED_LEVEL])
+        for i, name in enumerate(names):
+            for level in range(1, 6):
+                if level > 1:
+                    writer.writerow([name, level, name, level - 1])
+                for _ in range(2 if i else 0):
+                    writer.writerow([name, level, names[rng.randrange(i)], rng.randint(1, 5)])
+    graph = dependencies.prerequisites(path)
+    reverse = dependencies.required_by(path)
+
+    def depends_on(building, level):
+        return graph.get((building, level), ())
+
+    monkeypatch.setattr(planner, 'depends_on', depends_on)
+    monkeypatch.setattr(planner, 'required_by', lambda: reverse)
+    fuzz(names, list(range(0, 6)), depends_on, seed)